@@ -7,9 +7,31 @@
 # Winter 2021
 
 import pandas as pd
-import csv
-import pathlib
+import os
 import sys
+import importlib.util
+
+# CSV parsing is handed to PyArrow's multithreaded reader when PyArrow is installed.
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+if CSV_ENGINE == "pyarrow":
+    import pyarrow
+    import pyarrow.csv
+
+# Cell values read as missing (and later filled with "nan"), whichever CSV engine is used:
+# the pandas read_csv defaults, passed explicitly so that both engines agree.
+MISSING_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Columns with few distinct values, repeated across many rows, are read as pandas categoricals:
+# each distinct value is stored once, and every row holds only a small integer code.
+CATEGORY_COLUMNS = ["fileFormat", "study"]
+
+# Download information CSVs larger than this many bytes are streamed in chunks
+# (see summarize_downloads_in_chunks), rather than loaded into memory all at once.
+DOWNLOAD_STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
 
 #########################################################################################################################################################
 #########################################################################################################################################################
@@ -28,12 +50,43 @@ def output_message():
 
     """
 
-    i = 0
-    while i < 1:
-        output_str = "\nDATA PROCESSING UNDERWAY. THIS PROGRAM WILL TAKE SEVERAL MINUTES TO RUN. PLEASE BE PATIENT.\n\n\n"
-        sys.stdout.write(output_str)
-        sys.stdout.flush()
-        i += 1
+    output_str = "\nDATA PROCESSING UNDERWAY. THIS PROGRAM WILL TAKE SEVERAL MINUTES TO RUN. PLEASE BE PATIENT.\n\n\n"
+    print(output_str, end="", flush=True)
+
+
+def check_total(total, expected, name):
+
+    """
+    Prints a total of counts, and a warning if it differs from the
+    expected number of records, which would mean records were lost (or counted twice)
+    somewhere between the input spreadsheet and the counts.
+
+    Parameters
+    ----------
+    total: int
+        A total of counts, such as the sum of a pandas Series of counts.
+
+    expected: int
+        The expected total, such as the number of rows in an input spreadsheet.
+
+    name: str
+        Label printed before the total.
+
+    Returns
+    ----------
+    total: int
+        The total of counts.
+
+    """
+
+    total = int(total)
+
+    print(name + ": ", total, end="\n\n")
+
+    if total != expected:
+        print("WARNING: " + name + " should be " + str(expected) + ", but is " + str(total) + ".", end="\n\n")
+
+    return total
 
 
 #########################################################################################################################################################
@@ -43,6 +96,141 @@ def output_message():
 # SECTION 1: FUNCTIONS TO MANAGE FILE INFORMATION METADATA
 
 
+def categorize_in_order_of_appearance(values):
+
+    """
+    Converts a Series to a categorical whose categories are listed in the order
+    in which each value first appears, rather than in alphabetical order.
+
+    value_counts and sort=False groupbys list a categorical's values in category order,
+    so this keeps tied counts in the order their values first appear in the CSV file.
+
+    Parameters
+    ----------
+    values: pandas Series
+        String values.
+
+    Returns
+    ----------
+    values: pandas Series
+        Categorical values.
+
+    """
+
+    values = values.astype(pd.CategoricalDtype(pd.unique(values)))
+
+    return values
+
+
+def fill_missing_values(df):
+
+    """
+    Replaces missing cells with the string "nan", as later functions expect,
+    converts every column to strings, and then converts the columns listed in
+    CATEGORY_COLUMNS to categoricals.
+
+    Missing cells are filled before any column is categorical: a categorical
+    column only accepts values among its categories, and pandas checks the fill value
+    against every categorical column, even one with no missing cells.
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        Records from CSV file, read with every column as strings.
+
+    Returns
+    ----------
+    df: pandas DataFrame
+        Records from CSV file, with no missing cells.
+
+    """
+
+    df = df.fillna("nan").astype(str)
+
+    category_columns = [column for column in df.columns if column in CATEGORY_COLUMNS]
+
+    df = df.assign(**{column: categorize_in_order_of_appearance(df[column]) for column in category_columns})
+
+    return df
+
+
+def read_csv_columns_with_pandas(filename, output_headers, chunksize=None):
+
+    """
+    Opens the CSV file into a DataFrame object, reading only the columns
+    specified in output_headers, in that order. Columns are read as text,
+    missing cells become the string "nan", as later functions expect, and
+    columns listed in CATEGORY_COLUMNS are then converted to categoricals.
+
+    Uses PyArrow's CSV reader when PyArrow is installed, and otherwise
+    the pandas C engine with low_memory=False. The C engine memory-maps the
+    CSV file (memory_map=True) and parses it straight from the page cache.
+
+    Both readers are told that every column is a string, so that values
+    such as "007" or "00123" are kept as they appear in the CSV file.
+    (With pd.read_csv(engine="pyarrow"), pandas applies dtype only after
+    PyArrow has already guessed each column's type, so "007" would become "7.0".)
+
+    If chunksize is given, the CSV file is instead streamed as a sequence of
+    DataFrames of at most chunksize rows each, so that only one chunk is held
+    in memory at a time. PyArrow's reader cannot stream chunks of a set number of rows,
+    so chunked reads always use the C engine, with the same string columns and
+    MISSING_VALUES as a whole-file read, so that either engine gives the same values.
+    (That matters for the merge on file identifiers: the file metadata may be read by
+    PyArrow and the download information by the C engine.)
+
+    Parameters
+    ----------
+    filename: str
+        The name of the CSV file.
+
+    output_headers: list
+        The names of the columns to read.
+
+    chunksize: int, optional
+        The number of rows per chunk when streaming the CSV file.
+
+    Returns
+    ----------
+    df: pandas DataFrame, or iterator of pandas DataFrames if chunksize is given
+        Records from CSV file.
+
+    """
+
+    c_engine_options = {
+        "dtype": {column: object for column in output_headers},
+        "usecols": output_headers,
+        "keep_default_na": False,
+        "na_values": MISSING_VALUES,
+        "engine": "c",
+        "memory_map": True,
+    }
+
+    if chunksize is not None:
+        chunks = pd.read_csv(filename, chunksize=chunksize, **c_engine_options)
+        return (fill_missing_values(chunk[output_headers]) for chunk in chunks)
+
+    if CSV_ENGINE == "pyarrow":
+        convert_options = pyarrow.csv.ConvertOptions(
+            include_columns=output_headers,
+            column_types={column: pyarrow.string() for column in output_headers},
+            null_values=MISSING_VALUES,
+            strings_can_be_null=True,
+        )
+        parse_options = pyarrow.csv.ParseOptions(newlines_in_values=True)
+        df = pyarrow.csv.read_csv(filename, parse_options=parse_options, convert_options=convert_options).to_pandas()
+    else:
+        df = pd.read_csv(filename, low_memory=False, **c_engine_options)
+
+    # usecols keeps the parser from reading columns we never use;
+    # selecting output_headers afterwards restores the expected column order.
+    df = df[output_headers]
+
+    df = fill_missing_values(df)
+
+    return df
+
+
 def read_file_info_csv_with_pandas(filename):
 
     """
@@ -60,8 +248,9 @@ def read_file_info_csv_with_pandas(filename):
     in the Sage Bionetworks AD Knowledge Portal.
 
     Opens the CSV file into a DataFrame object,
-    drops all columns except the ones specified in output_headers,
-    and converts the DataFrame to a list of row lists.
+    reading only the columns specified in output_headers.
+    Later functions select the columns they need from the DataFrame
+    directly rather than from a list of row lists.
 
     Parameters
     ----------
@@ -70,14 +259,11 @@ def read_file_info_csv_with_pandas(filename):
 
     Returns
     ----------
-    list_of_row_lists_file_info: list of lists
+    file_info_df: pandas DataFrame
         Records from metadata CSV file.
 
     """
 
-    df = pd.read_csv(filename,dtype=str)
-    list_of_row_lists_file_info = []
-
     output_headers = [
         "fileFormat",
         "name",
@@ -85,153 +271,177 @@ def read_file_info_csv_with_pandas(filename):
         "study",
     ]
 
-    df = df.reindex(columns = output_headers)
+    file_info_df = read_csv_columns_with_pandas(filename, output_headers)
 
-    for i in df.index.values:
+    return file_info_df
 
-        initial_row_as_list = df.iloc[i].to_list()
 
-        row_as_list = []
-        for cell in initial_row_as_list:
-            if pd.isnull(cell):
-                cell = str(cell)
-            row_as_list.append(cell)
-
-        list_of_row_lists_file_info.append(row_as_list)
-
-    return list_of_row_lists_file_info
+def count_fileFormats(fileFormat_series):
+    """
+    Counts the file format values in the "fileFormat" column
+    of the DataFrame returned by read_file_info_csv_with_pandas, ordered by frequency.
 
+    The following Stack Overflow page was helpful in writing this function:
+    "How do I sort a dictionary by value?" (accessed March 7, 2021).
 
-def create_fileFormat_list(list_of_row_lists_file_info):
-    """
-    Creates a list of file format values from the
-    list_of_row_lists_file_info returned by the read_file_info_csv_with_pandas function above.
+    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
 
     Parameters
     ----------
-    list_of_row_lists_file_info: list of lists
-        The name of the object returned by the 
+    fileFormat_series: pandas Series
+        The "fileFormat" column of the DataFrame returned by the
         read_file_info_csv_with_pandas function above.
 
     Returns
     ----------
-    fileFormat_list: list
-        List of file format information from all files
-        in the Sage Bionetworks AD Knowledge Portal.
+    sorted_fileFormat_info: pandas Series
+        Descending-order int64 Series of file format counts, indexed by file format,
+        from all files in the Sage Bionetworks AD Knowledge Portal.
     """
-    
-    fileFormat_list = []
 
-    for list_item in list_of_row_lists_file_info:
-        fileFormat_list.append(list_item[0])
+    # Stable sort: tied counts keep the order in which each file format first appears.
+    sorted_fileFormat_info = fileFormat_series.value_counts(sort=False).sort_values(ascending=False, kind="stable")
     
-    return fileFormat_list
+    return sorted_fileFormat_info
 
 
-def create_fileName_list(list_of_row_lists_file_info):
+def extract_filename_extensions(filenames):
     """
-    Creates a list of file name values from the
-    list_of_row_lists_file_info returned by the read_file_info_csv_with_pandas function above.
+    Extracts the format extension from every file name in a single vectorized
+    pass, following the same rules as pathlib.PurePosixPath(filename).suffix: the text
+    from the last "." of the final path component, provided that the "." is
+    neither the first nor the last character of that component.
+
+    As in PurePosixPath, only "/" separates path components ("\\" is an ordinary
+    character), and trailing "/" and "/." are ignored, so "a.txt/" has the extension ".txt".
+
+    A few dozen distinct extensions are shared by every file name, so, like the
+    columns in CATEGORY_COLUMNS, the extensions are returned as a categorical,
+    with categories in order of first appearance (see categorize_in_order_of_appearance).
 
     Parameters
     ----------
-    list_of_row_lists_file_info: list of lists
-        The name of the object returned by the 
-        read_csv_with_pandas function above.
+    filenames: list or pandas Series
+        File name values.
 
     Returns
     ----------
-    fileName_list: list
-        List of file name information from all files
-        in the Sage Bionetworks AD Knowledge Portal.
+    filename_extensions: pandas Series
+        Categorical file name extension values, with "" for file names that have no extension.
     """
-    
-    fileName_list = []
 
-    for list_item in list_of_row_lists_file_info:
-        fileName_list.append(list_item[1])
-    
-    return fileName_list
+    filename_extensions = pd.Series(filenames, dtype=object).str.extract(r"(?<=[^/])(\.[^./]+)(?:/\.?)*\Z", expand=False).fillna("")
 
+    filename_extensions = categorize_in_order_of_appearance(filename_extensions)
 
-def count_fileFormats(fileFormat_list):
+    return filename_extensions
+
+
+def count_fileNameExtensions(fileName_series):
     """
-    Creates a list of file format values from the fileName_list 
-    of a previous function, ordered by frequency.
+    Counts the file name format extension values in the "name" column
+    of the DataFrame returned by read_file_info_csv_with_pandas, ordered by frequency.
 
-    The following Stack Overflow page was helpful in writing this function:
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
+    The following Stack Overflow pages were helpful in writing this function:
 
+    "How do I sort a dictionary by value?" (accessed March 7, 2021).
     https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
 
+    "Extracting extension from filename in Python," (accessed March 7, 2021).
+    https://stackoverflow.com/questions/541390/extracting-extension-from-filename-in-python
+    
     Parameters
     ----------
-    fileFormat_list: list
-        The name of the object returned by the 
-        create_fileFormat_list function above.
+    fileName_series: pandas Series
+        The "name" column of the DataFrame returned by the
+        read_file_info_csv_with_pandas function above.
 
     Returns
     ----------
-    sorted_fileFormat_info: list
-        List of file format values, ordered by frequency, 
+    sorted_fileNameExtensions_info: pandas Series
+        Descending-order int64 Series of file name extension counts, indexed by extension,
         from all files in the Sage Bionetworks AD Knowledge Portal.
     """
 
-    fileFormat_dict = {}
-    
-    for format_value in fileFormat_list:
-        if format_value in fileFormat_dict:
-            fileFormat_dict[format_value] = int(fileFormat_dict[format_value]) + 1
-        elif format_value not in fileFormat_dict:
-            fileFormat_dict[format_value] = int(1) 
+    name_value_extensions = extract_filename_extensions(fileName_series)
 
-    sorted_fileFormat_info = sorted(fileFormat_dict.items(), key=lambda x: x[1], reverse=True)
-    
-    return sorted_fileFormat_info
+    # Stable sort: tied counts keep the order in which each extension first appears.
+    sorted_fileNameExtensions_info = name_value_extensions.value_counts(sort=False).sort_values(ascending=False, kind="stable")
 
+    return sorted_fileNameExtensions_info
 
-def count_fileNameExtensions(fileName_list):
+
+def summarize_file_info(file_info_df):
     """
-    Creates a list of file name format extension values from the fileName_list 
-    of a previous function, ordered by frequency.
+    Computes every file metadata count used by this program from the one
+    file metadata DataFrame: file formats and file name extensions for Section 1,
+    and number of files by study for Section 3.
 
-    The following Stack Overflow pages were helpful in writing this function:
+    Parameters
+    ----------
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function above.
 
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
-    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
+    Returns
+    ----------
+    file_info_summary: dict
+        "fileFormat": sorted_fileFormat_info, as returned by count_fileFormats.
+        "fileNameExtension": sorted_fileNameExtensions_info, as returned by count_fileNameExtensions.
+        "study": sorted_file_count_info_by_study, as returned by file_count_by_study.
+    """
+
+    file_info_summary = {
+        "fileFormat": count_fileFormats(file_info_df["fileFormat"]),
+        "fileNameExtension": count_fileNameExtensions(file_info_df["name"]),
+        "study": file_count_by_study(file_info_df),
+    }
+
+    return file_info_summary
+
+
+def build_value_count_table(fieldnames, first_counts, second_counts):
+
+    """
+    Lays out two sets of value counts as one table for an output CSV: the first
+    set of values and counts in the first two columns, followed below by the second set
+    in the last two columns, with the two middle columns left blank.
+
+    Empty values in the second set are written as "[NULL]".
 
-    "Extracting extension from filename in Python," (accessed March 7, 2021).
-    https://stackoverflow.com/questions/541390/extracting-extension-from-filename-in-python
-    
     Parameters
     ----------
-    fileName_list: list
-        The name of the object returned by the 
-        create_fileName_list function above.
+    fieldnames: list
+        The six column headers of the output CSV.
+
+    first_counts: pandas Series
+        Counts indexed by value, written in the first two columns.
+
+    second_counts: pandas Series
+        Counts indexed by value, written in the last two columns.
 
     Returns
     ----------
-    sorted_fileNameExtensions_info: list
-        List of file name extension values, ordered by frequency, 
-        from all files in the Sage Bionetworks AD Knowledge Portal.
+    value_count_table: pandas DataFrame
+        One row per value in first_counts, then one row per value in second_counts.
+
     """
 
-    name_value_extensions_list = []
-    fileNameExtensions_dict = {}
+    second_values = second_counts.index.astype(str)
 
-    for name_value in fileName_list:
-        name_value_extension = pathlib.Path(name_value).suffix
-        name_value_extensions_list.append(name_value_extension)
+    first_table = pd.DataFrame({
+        0: first_counts.index.astype(str),
+        1: first_counts.to_numpy(),
+    }).reindex(columns=range(6), fill_value="")
 
-    for name_value_extension in name_value_extensions_list:
-        if name_value_extension in fileNameExtensions_dict:
-            fileNameExtensions_dict[name_value_extension] = int(fileNameExtensions_dict[name_value_extension]) + 1
-        elif name_value_extension not in fileNameExtensions_dict:
-            fileNameExtensions_dict[name_value_extension] = int(1)
+    second_table = pd.DataFrame({
+        4: second_values.where(second_values != "", "[NULL]"),
+        5: second_counts.to_numpy(),
+    }).reindex(columns=range(6), fill_value="")
 
-    sorted_fileNameExtensions_info = sorted(fileNameExtensions_dict.items(), key=lambda x: x[1], reverse=True)
+    value_count_table = pd.concat([first_table, second_table], ignore_index=True)
+    value_count_table.columns = fieldnames
 
-    return sorted_fileNameExtensions_info
+    return value_count_table
 
 
 def write_preliminary_data_processing_results(output_filename, sorted_fileFormat_info, sorted_fileNameExtensions_info):
@@ -246,11 +456,11 @@ def write_preliminary_data_processing_results(output_filename, sorted_fileFormat
 
     Parameters
     ----------
-    sorted_fileFormat_info: list
-        List of values and counts for file format information.
+    sorted_fileFormat_info: pandas Series
+        Counts for file format information, indexed by file format.
     
-    sorted_fileNameExtensions_info: list
-        List of values and counts for file name extension information
+    sorted_fileNameExtensions_info: pandas Series
+        Counts for file name extension information, indexed by extension.
 
     output_filename: string
         The name of the desired CSV file to which
@@ -263,35 +473,49 @@ def write_preliminary_data_processing_results(output_filename, sorted_fileFormat
 
     """
 
-    with open(output_filename, 'w', encoding='utf-8') as output_csv:
+    with open(output_filename, 'w', encoding='utf-8', newline='', buffering=1 << 20) as output_csv:
 
         fieldnames = ["fileFormat value", "fileFormat count", "", "", "fileName extension value", "fileName extension count"]
 
-        writer = csv.DictWriter(output_csv, fieldnames = fieldnames)
-
-        writer.writeheader()
+        value_count_table = build_value_count_table(fieldnames, sorted_fileFormat_info, sorted_fileNameExtensions_info)
 
-        for fileFormat in sorted_fileFormat_info:
-            writer.writerow({"fileFormat value": fileFormat[0], "fileFormat count": fileFormat[1]})
-        
-        for fileNameExtension in sorted_fileNameExtensions_info:
-            fileNameExtension = list(fileNameExtension)
-            if len(fileNameExtension[0]) == 0:
-                fileNameExtension[0] = "[NULL]"
-                writer.writerow({"fileName extension value": fileNameExtension[0], "fileName extension count": fileNameExtension[1]})
-            else:
-                writer.writerow({"fileName extension value": fileNameExtension[0], "fileName extension count": fileNameExtension[1]})
+        value_count_table.to_csv(output_csv, index=False, lineterminator="\n")
         
         return output_csv
 
 
+def run_section1(file_info_df):
+    """
+    Computes the Section 1 counts from the file metadata and writes them to
+    output_file_info_values_and_counts.csv.
+
+    Parameters
+    ----------
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function above.
+
+    Returns
+    ----------
+    file_info_summary: dict
+        The object returned by the summarize_file_info function above.
+
+    """
+
+    file_info_summary = summarize_file_info(file_info_df)
+
+    write_preliminary_data_processing_results('output_file_info_values_and_counts.csv', file_info_summary["fileFormat"], file_info_summary["fileNameExtension"])
+
+    return file_info_summary
+
+
+
 #########################################################################################################################################################
 #########################################################################################################################################################
 #########################################################################################################################################################
 
 # SECTION 2: FUNCTIONS TO MANAGE DOWNLOAD INFORMATION (JUNE-DECEMBER 2020)
 
-def read_download_info_csv_with_pandas(filename):
+def read_download_info_csv_with_pandas(filename, chunksize=None):
     """
     Function written by Joe Muller, Digital Publishing Coordinator,
     during troubleshooting with Scott St. Louis for a metadata
@@ -309,257 +533,432 @@ def read_download_info_csv_with_pandas(filename):
     Sage Bionetworks AD Knowledge Portal from June to December 2020.
 
     Opens the CSV file into a DataFrame object,
-    drops all columns except the ones specified in output_headers,
-    and converts the DataFrame to a list of row lists.
+    reading only the columns specified in output_headers.
+    The DataFrame is read once and shared by every later function
+    that needs download information.
+
+    If chunksize is given, the CSV file is instead streamed as a sequence of
+    DataFrames of at most chunksize rows each (see summarize_downloads_in_chunks below).
 
     Parameters
     ----------
     filename: str
         The name of the CSV file.
 
+    chunksize: int, optional
+        The number of rows per chunk when streaming the CSV file.
+
     Returns
     ----------
-    list_of_row_lists_download_info: list of lists
+    download_info_df: pandas DataFrame, or iterator of pandas DataFrames if chunksize is given
         Records from metadata CSV file.
 
     """
 
-    df = pd.read_csv(filename,dtype=str)
-    list_of_row_lists_download_info = []
-
     output_headers = [
         "id",
         "name",
         "study",
     ]
 
-    df = df.reindex(columns = output_headers)
+    download_info_df = read_csv_columns_with_pandas(filename, output_headers, chunksize=chunksize)
+
+    return download_info_df
+
+
+def share_file_identifier_categories(file_info_df, download_info_df):
+
+    """
+    Converts the "id" column of both DataFrames to one shared categorical dtype,
+    whose categories are every file identifier found in either CSV file.
+
+    File identifiers repeat across many download records. With one shared set of
+    categories, each identifier is stored once, and the merge and groupby steps below
+    compare small integer codes instead of hashing strings.
 
-    for i in df.index.values:
+    Parameters
+    ----------
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function in Section 1 above.
 
-        initial_row_as_list = df.iloc[i].to_list()
+    download_info_df: pandas DataFrame
+        The object returned by the read_download_info_csv_with_pandas function above.
 
-        row_as_list = []
-        for cell in initial_row_as_list:
-            if pd.isnull(cell):
-                cell = str(cell)
-            row_as_list.append(cell)
+    Returns
+    ----------
+    file_info_df: pandas DataFrame
+        file_info_df, with a categorical "id" column.
 
-        list_of_row_lists_download_info.append(row_as_list)
+    download_info_df: pandas DataFrame
+        download_info_df, with a categorical "id" column of the same dtype.
 
-    return list_of_row_lists_download_info
+    """
 
+    file_identifier_dtype = pd.CategoricalDtype(
+        pd.unique(pd.concat([file_info_df["id"], download_info_df["id"]], ignore_index=True))
+    )
 
-def download_frequency_by_identifier(list_of_row_lists_download_info):
+    file_info_df = file_info_df.assign(id=file_info_df["id"].astype(file_identifier_dtype))
+    download_info_df = download_info_df.assign(id=download_info_df["id"].astype(file_identifier_dtype))
 
+    return file_info_df, download_info_df
+
+
+def merge_file_info_into_downloads(file_info_df, download_info_df):
+    
     """
-    Counts unique file identifiers from download records in the 
-    June-December 2020 AD Knowledge Portal download information CSV,
-    and returns a descending-order dictionary of unique file identifiers by
-    number of downloads.
+    Looks up the file format of every download record by merging the file metadata
+    into the download information on the file identifier, for later functions to process.
 
-    The following Stack Overflow page was helpful in writing this function:
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
+    The merge is a single pandas hash join rather than a scan of one list of records
+    for every record in the other. It is a left merge, so download records whose file
+    identifier is not in the file metadata are kept, with a missing "fileFormat",
+    rather than silently dropped.
 
-    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
+    The merge also checks that each file identifier appears only once in the file
+    metadata (validate="m:1"); a repeated identifier would otherwise count every
+    download of that file more than once, and raises pandas.errors.MergeError instead.
+    File metadata records with a missing file identifier (filled with "nan" when
+    the CSV file was read) are left out of the merge: they are not a repeated identifier,
+    and no download record should match them.
 
     Parameters
     ----------
-    list_of_row_lists_download_info: list of lists
+    file_info_df: pandas DataFrame
+        Information from "ad_knowledge_portal_files_information" CSV file,
+        pulled into program by read_file_info_csv_with_pandas function in Section 1 above.
+    
+    download_info_df: pandas DataFrame
         Information from "ad_knowledge_portal_downloads_june_december_2020" CSV file,
         pulled into program by read_download_info_csv_with_pandas function above.
         
 
     Returns
     ----------
-    sorted_file_identifier_download_info: dict
-        Dictionary of unique file identifiers, ordered by download frequency
-        from June to December 2020.
+    merged_download_info_df: pandas DataFrame
+        One row per download record, with "id", "name", "study", and "fileFormat" columns.
+        "fileFormat" is missing for download records not found in the
+        "ad_knowledge_portal_files_information" CSV spreadsheet.
 
     """
 
-    file_identifier_list = []
-    file_identifier_dict = {}
+    file_format_by_id_df = file_info_df.loc[file_info_df["id"] != "nan", ["id", "fileFormat"]]
 
-    for download_record in list_of_row_lists_download_info:
-        file_identifier = download_record[0]
-        file_identifier_list.append(file_identifier)
-    
-    for file_identifier in file_identifier_list:
-        if file_identifier in file_identifier_dict:
-            file_identifier_dict[file_identifier] += 1
-        elif file_identifier not in file_identifier_dict:
-            file_identifier_dict[file_identifier] = 1
-        
-    sorted_file_identifier_download_info = sorted(file_identifier_dict.items(), key=lambda x: x[1], reverse=True)
+    merged_download_info_df = download_info_df.merge(
+        file_format_by_id_df,
+        on="id",
+        how="left",
+        validate="m:1",
+    )
 
-    sorted_file_identifier_download_info = dict(sorted_file_identifier_download_info)
+    return merged_download_info_df
 
 
-    return sorted_file_identifier_download_info
+def count_downloads_by_group(merged_download_info_df):
 
+    """
+    Counts download records for every combination of file identifier, study,
+    file format, and filename format extension value that occurs in the
+    June-December 2020 AD Knowledge Portal download information CSV.
+
+    Every download count in Sections 2 and 3 is a sum over one level of this table
+    (see sum_download_counts_by below), so the download records are grouped only once.
+
+    Download records with no matching file metadata record are kept in the table
+    with a missing file format (dropna=False), so that they still count toward
+    the file identifier, filename format extension, and study totals.
+
+    The following Stack Overflow page was helpful in writing this function:
+
+    "Extracting extension from filename in Python," (accessed March 7, 2021).
+    https://stackoverflow.com/questions/541390/extracting-extension-from-filename-in-python
+
+    Parameters
+    ----------
+    merged_download_info_df: pandas DataFrame
+        The object returned by the merge_file_info_into_downloads function above.
+
+    Returns
+    ----------
+    download_count_series: pandas Series
+        Number of download records, indexed by "id", "study", "fileFormat",
+        and "fileNameExtension".
 
-def create_intersection_list(list_of_row_lists_file_info, list_of_row_lists_download_info):
-    
     """
-    Creates a list of file identifiers located in both input spreadsheets, along with the file format 
-    corresponding to each file identifier, for later functions to process.
 
-    The following Stack Overflow pages was helpful in writing this function:
+    filename_format_extension_values = extract_filename_extensions(merged_download_info_df["name"])
+
+    download_count_series = (
+        merged_download_info_df
+        .assign(fileNameExtension=filename_format_extension_values)
+        .groupby(["id", "study", "fileFormat", "fileNameExtension"], observed=True, sort=False, dropna=False)
+        .size()
+    )
+
+    return download_count_series
+
+
+def sum_download_counts_by(download_count_series, level, sort=False):
+
+    """
+    Adds up the download counts from count_downloads_by_group over one of its levels
+    and returns them as a descending-order pandas Series.
+
+    Grouping on a level drops missing keys, so summing by "fileFormat" leaves out
+    the download records with no matching file metadata record.
 
-    "Best way to compare two large sets of strings in Python," (accessed March 20, 2021).
-    https://stackoverflow.com/questions/17263557/best-way-to-compare-two-large-sets-of-strings-in-python/17264117#17264117
-    
     Parameters
     ----------
-    list_of_row_lists_file_info: list of lists
-        Information from "ad_knowledge_portal_files_information" CSV file,
-        pulled into program by read_file_info_csv_with_pandas function in Section 1 above.
-    
-    list_of_row_lists_download_info: list of lists
-        Information from "ad_knowledge_portal_downloads_june_december_2020" CSV file,
-        pulled into program by read_download_info_csv_with_pandas function above.
-        
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function above.
+
+    level: str
+        "id", "study", "fileFormat", or "fileNameExtension".
+
+    sort: bool
+        If False, tied counts keep the order in which each value first appears in the
+        download records. If True, they keep the order of the level's categories.
 
     Returns
     ----------
-    intersection_list_with_file_format_info: list
-        List of lists of unique identifiers, with corresponding format information, for files 
-        appearing both in the "ad_knowledge_portal_files_information" CSV spreadsheet and the 
-        "ad_knowledge_portal_downloads_june_december_2020" CSV spreadsheet.
+    sorted_download_info: pandas Series
+        Descending-order int64 Series of download counts, indexed by level.
 
     """
 
-    set_1 = []
-    set_2 = []
-    condensed_file_metadata_record_list = []
-    condensed_download_record_list = []
+    download_count_series = download_count_series.groupby(level=level, observed=True, sort=sort).sum()
 
-    for file_metadata_record in list_of_row_lists_file_info:
-        condensed_file_metadata_record = [file_metadata_record[0], file_metadata_record[2], file_metadata_record[3]]
-        condensed_file_metadata_record_list.append(condensed_file_metadata_record)
+    # Stable sort: tied counts keep the order given by the groupby above.
+    sorted_download_info = download_count_series.sort_values(ascending=False, kind="stable")
 
-    for download_record in list_of_row_lists_download_info:
-        condensed_download_record = download_record[0]
-        condensed_download_record_list.append(condensed_download_record)
+    return sorted_download_info
 
-    for condensed_file_metadata_record in condensed_file_metadata_record_list:
-        file_identifier = condensed_file_metadata_record[1]
-        set_1.append(file_identifier)
 
+def download_frequency_by_identifier(download_count_series):
+
+    """
+    Counts unique file identifiers from download records in the 
+    June-December 2020 AD Knowledge Portal download information CSV,
+    and returns a descending-order Series of unique file identifiers by
+    number of downloads.
 
-    set_2 = condensed_download_record_list
+    Parameters
+    ----------
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function above.
 
-    intersection_list = list(set(set_1).intersection(set_2))
+    Returns
+    ----------
+    sorted_file_identifier_download_info: pandas Series
+        Series of unique file identifiers, ordered by download frequency
+        from June to December 2020.
 
-    intersection_list_with_file_format_info = []
+    """
 
-    for file_metadata_record in list_of_row_lists_file_info:
-        condensed_file_metadata_record = [file_metadata_record[0], file_metadata_record[2], file_metadata_record[3]]
-        if file_metadata_record[2] in intersection_list:
-            intersection_list_with_file_format_info.append([file_metadata_record[2], file_metadata_record[0]])
+    sorted_file_identifier_download_info = sum_download_counts_by(download_count_series, "id")
 
-    return intersection_list_with_file_format_info
+    return sorted_file_identifier_download_info
 
 
-def download_frequency_by_file_format(intersection_list_with_file_format_info, sorted_file_identifier_download_info):
+def download_frequency_by_file_format(download_count_series):
     
     """
     Counts download frequency by file format for files listed in the 
     June-December 2020 AD Knowledge Portal download information CSV,
-    and returns a descending-order dictionary of download counts organized by 
+    and returns a descending-order Series of download counts organized by 
     file format.
 
-    The following Stack Overflow page was helpful in writing this function:
+    Download records with no matching file metadata record have no file format,
+    and are not counted.
 
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
-    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
+    Tied counts are listed in the order in which each file format first appears
+    in the file metadata (the order of the "fileFormat" categories), as in the
+    file metadata counts of Section 1, rather than in download order.
 
     Parameters
     ----------
-    intersection_list_with_file_format_info: list of lists
-        List of lists of unique identifiers, with corresponding format information, for files 
-        appearing both in the "ad_knowledge_portal_files_information" CSV spreadsheet and the 
-        "ad_knowledge_portal_downloads_june_december_2020" CSV spreadsheet.
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function above.
+
+    Returns
+    ----------
+    sorted_file_format_info: pandas Series
+        Descending-order Series of download counts organized by 
+        file format.
+    """
+
+    sorted_file_format_info = sum_download_counts_by(download_count_series, "fileFormat", sort=True)
+
+    return sorted_file_format_info
 
-    sorted_file_identifier_download_info: dict
-        List of unique file identifiers, ordered by download frequency
-        from June to December 2020.
 
+def download_frequency_by_filename_format_extension(download_count_series):
+    """
+    Utilizes download information CSV to produce a descending-order list of filename format extension values
+    by download frequency, June-December 2020.
+
+    Parameters
+    ----------
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function above.
 
     Returns
     ----------
-    sorted_file_format_info: dict
-        Descending-order dictionary of download counts organized by 
-        file format.
+    sorted_filename_format_extensions_info: pandas Series
+        Descending-order Series of filename format extension values
+        by download frequency, June-December 2020.
     """
 
-    file_format_dict = {}
+    sorted_filename_format_extensions_info = sum_download_counts_by(download_count_series, "fileNameExtension")
 
+    return sorted_filename_format_extensions_info
 
-    for file_format_item in intersection_list_with_file_format_info:
-        if file_format_item[1] not in file_format_dict:
-            file_format_dict[file_format_item[1]] = 0
-        elif file_format_item[1] in file_format_dict:
-            continue
 
-    for key, value in sorted_file_identifier_download_info.items():
-        for sub_list in intersection_list_with_file_format_info:
-            if key in sub_list[0]:
-                file_format_dict[sub_list[1]] += value
+def combine_download_counts(download_count_series_list):
 
-    sorted_file_format_info = sorted(file_format_dict.items(), key=lambda x: x[1], reverse=True)
+    """
+    Adds up several tables returned by count_downloads_by_group, for example one
+    per chunk of the download information CSV, into a single table of the same shape.
 
-    sorted_file_format_info = dict(sorted_file_format_info)
+    The combined table has one row per combination of file identifier, study,
+    file format, and filename format extension value, so its size depends on the
+    number of distinct combinations, not on the number of download records.
 
-    return sorted_file_format_info
+    Parameters
+    ----------
+    download_count_series_list: list
+        pandas Series, each returned by the count_downloads_by_group function above.
 
+    Returns
+    ----------
+    download_count_series: pandas Series
+        Number of download records, indexed by "id", "study", "fileFormat",
+        and "fileNameExtension".
 
-def download_frequency_by_filename_format_extension(list_of_row_lists_download_info):
     """
-    Utilizes download information CSV to produce a descending-order list of filename format extension values
-    by download frequency, June-December 2020.
 
-    The following Stack Overflow pages were helpful in writing this function:
+    download_count_series = pd.concat(download_count_series_list)
 
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
-    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
+    download_count_series = download_count_series.groupby(
+        level=["id", "study", "fileFormat", "fileNameExtension"], observed=True, sort=False, dropna=False
+    ).sum()
 
-    "Extracting extension from filename in Python," (accessed March 7, 2021).
-    https://stackoverflow.com/questions/541390/extracting-extension-from-filename-in-python
+    return download_count_series
+
+
+def summarize_download_counts(download_count_series, row_count):
+    """
+    Computes every download count used by this program from the table returned by
+    count_downloads_by_group (or combine_download_counts): downloads by file identifier,
+    file format, and filename format extension for Section 2, and downloads by study for Section 3.
+    Also counts the download records with no matching file metadata record, which are
+    the rows of the table with a missing file format.
 
     Parameters
     ----------
-    list_of_row_lists_download_info: list of lists
-        Information from "ad_knowledge_portal_downloads_june_december_2020" CSV file,
-        pulled into program by read_download_info_csv_with_pandas function above.
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function above.
+
+    row_count: int
+        Number of rows read from the download information CSV.
 
     Returns
     ----------
-    sorted_filename_format_extensions_info: dict
-        Descending-order dictionary of filename format extension values
-        by download frequency, June-December 2020.
+    download_info_summary: dict
+        "rows": row_count.
+        "id": sorted_file_identifier_download_info, as returned by download_frequency_by_identifier.
+        "fileFormat": sorted_file_format_info, as returned by download_frequency_by_file_format.
+        "fileNameExtension": sorted_filename_format_extensions_info, as returned by download_frequency_by_filename_format_extension.
+        "study": sorted_study_download_info, as returned by download_count_by_study.
+        "unmatched": number of download records whose file identifier is not in the file metadata.
     """
 
-    filename_format_extension_value_list = []
-    filename_format_extensions_dict = {}
+    unmatched = download_count_series.index.get_level_values("fileFormat").isna()
 
-    for row_list in list_of_row_lists_download_info:
-        filename = row_list[1]
-        filename_format_extension_value = pathlib.Path(filename).suffix
-        filename_format_extension_value_list.append(filename_format_extension_value)
+    download_info_summary = {
+        "rows": row_count,
+        "id": download_frequency_by_identifier(download_count_series),
+        "fileFormat": download_frequency_by_file_format(download_count_series),
+        "fileNameExtension": download_frequency_by_filename_format_extension(download_count_series),
+        "study": download_count_by_study(download_count_series),
+        "unmatched": int(download_count_series[unmatched].sum()),
+    }
 
-    for filename_format_extension_value in filename_format_extension_value_list:
-        if filename_format_extension_value not in filename_format_extensions_dict:
-            filename_format_extensions_dict[filename_format_extension_value] = 1
-        elif filename_format_extension_value in filename_format_extensions_dict:
-            filename_format_extensions_dict[filename_format_extension_value] += 1
+    return download_info_summary
 
-    sorted_filename_format_extensions_info = sorted(filename_format_extensions_dict.items(), key=lambda x: x[1], reverse=True)
 
-    sorted_filename_format_extensions_info = dict(sorted_filename_format_extensions_info)
+def summarize_downloads(download_info_df, file_info_df):
+    """
+    Computes every download count used by this program from the one
+    download information DataFrame.
 
-    return sorted_filename_format_extensions_info
+    The download records are merged with the file metadata and grouped once,
+    by count_downloads_by_group; every count is a sum over that one table.
+
+    Parameters
+    ----------
+    download_info_df: pandas DataFrame
+        The object returned by the read_download_info_csv_with_pandas function above.
+
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function in Section 1 above,
+        used to look up the file format of each downloaded file.
+
+    Returns
+    ----------
+    download_info_summary: dict
+        The object returned by the summarize_download_counts function above.
+    """
+
+    merged_download_info_df = merge_file_info_into_downloads(file_info_df, download_info_df)
+
+    download_count_series = count_downloads_by_group(merged_download_info_df)
+
+    download_info_summary = summarize_download_counts(download_count_series, len(download_info_df))
+
+    return download_info_summary
+
+
+def summarize_downloads_in_chunks(filename, file_info_df, chunksize=50000):
+    """
+    Streams the download information CSV in chunks of chunksize rows and computes
+    the same counts as summarize_downloads.
+
+    Each chunk is merged and grouped by count_downloads_by_group, and its table is added
+    to a running total with combine_download_counts, so only one chunk of download
+    records is held in memory at a time.
+
+    Parameters
+    ----------
+    filename: str
+        The name of the download information CSV file.
+
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function in Section 1 above.
+
+    chunksize: int
+        The number of rows to read from the CSV file at a time.
+
+    Returns
+    ----------
+    download_info_summary: dict
+        The object returned by the summarize_download_counts function above.
+    """
+
+    download_count_series = None
+    row_count = 0
+
+    for chunk in read_download_info_csv_with_pandas(filename, chunksize=chunksize):
+        chunk_count_series = count_downloads_by_group(merge_file_info_into_downloads(file_info_df, chunk))
+        if download_count_series is None:
+            download_count_series = chunk_count_series
+        else:
+            download_count_series = combine_download_counts([download_count_series, chunk_count_series])
+        row_count += len(chunk)
+
+    download_info_summary = summarize_download_counts(download_count_series, row_count)
+
+    return download_info_summary
 
 
 def write_download_info_to_csv_file(output_filename, sorted_file_format_info, sorted_filename_format_extensions_info):
@@ -573,12 +972,12 @@ def write_download_info_to_csv_file(output_filename, sorted_file_format_info, so
 
     Parameters
     ----------
-    sorted_file_format_info: dictionary
-        Descending-order dictionary of download counts organized by 
+    sorted_file_format_info: pandas Series
+        Descending-order Series of download counts organized by 
         file format.
 
-    sorted_filename_format_extensions_info: dictionary
-        Descending-order dictionary of filename format extension values
+    sorted_filename_format_extensions_info: pandas Series
+        Descending-order Series of filename format extension values
         by download frequency, June-December 2020.
 
     output_filename: string
@@ -591,27 +990,56 @@ def write_download_info_to_csv_file(output_filename, sorted_file_format_info, so
         A spreadsheet file with the parameter lists described above.
 
     """
-    with open(output_filename, 'w', encoding='utf-8') as output_csv_2:
+    with open(output_filename, 'w', encoding='utf-8', newline='', buffering=1 << 20) as output_csv_2:
 
         fieldnames = ["fileFormat value", "fileFormat download count", "", "", "fileName format extension value", "fileName format extension download count"]
 
-        writer = csv.DictWriter(output_csv_2, fieldnames = fieldnames)
+        value_count_table = build_value_count_table(fieldnames, sorted_file_format_info, sorted_filename_format_extensions_info)
 
-        writer.writeheader()
-
-        for key, value in sorted_file_format_info.items():
-            writer.writerow({"fileFormat value": key, "fileFormat download count": value})
-            
-        for key, value in sorted_filename_format_extensions_info.items():
-            if len(key) == 0:
-                key = "[NULL]"
-                writer.writerow({"fileName format extension value": key, "fileName format extension download count": value})
-            else:
-                writer.writerow({"fileName format extension value": key, "fileName format extension download count": value})
+        value_count_table.to_csv(output_csv_2, index=False, lineterminator="\n")
         
     return output_csv_2
 
 
+def run_section2(file_info_df, filename):
+    """
+    Computes the Section 2 and Section 3 download counts from the download information CSV
+    and writes the Section 2 counts to output_download_info_values_and_counts.csv.
+
+    Download information CSVs larger than DOWNLOAD_STREAMING_THRESHOLD_BYTES are streamed
+    in chunks by summarize_downloads_in_chunks; smaller ones are read at once and
+    summarized by summarize_downloads. Both give the same counts, since
+    read_csv_columns_with_pandas reads every column as a string (with the same
+    MISSING_VALUES) whether or not the CSV file is read in chunks.
+
+    Parameters
+    ----------
+    file_info_df: pandas DataFrame
+        The object returned by the read_file_info_csv_with_pandas function in Section 1 above.
+
+    filename: str
+        The name of the download information CSV file.
+
+    Returns
+    ----------
+    download_info_summary: dict
+        The object returned by the summarize_download_counts function above.
+
+    """
+
+    if os.path.getsize(filename) > DOWNLOAD_STREAMING_THRESHOLD_BYTES:
+        download_info_summary = summarize_downloads_in_chunks(filename, file_info_df)
+    else:
+        download_info_df = read_download_info_csv_with_pandas(filename)
+        file_info_df, download_info_df = share_file_identifier_categories(file_info_df, download_info_df)
+        download_info_summary = summarize_downloads(download_info_df, file_info_df)
+
+    write_download_info_to_csv_file('output_download_info_values_and_counts.csv', download_info_summary["fileFormat"], download_info_summary["fileNameExtension"])
+
+    return download_info_summary
+
+
+
 #########################################################################################################################################################
 #########################################################################################################################################################
 #########################################################################################################################################################
@@ -619,45 +1047,29 @@ def write_download_info_to_csv_file(output_filename, sorted_file_format_info, so
 # SECTION 3: ORGANIZING FILE INFORMATION BY STUDY
 
 
-def download_count_by_study(list_of_row_lists_download_info):
+def download_count_by_study(download_count_series):
     """
     Counts number of file downloads by study.
 
-    The following Stack Overflow page was helpful in writing this function:
-
-    "How do I sort a dictionary by value?" (accessed March 7, 2021).
-    https://stackoverflow.com/questions/613183/how-do-i-sort-a-dictionary-by-value
-
     Parameters
     ----------
-    list_of_row_lists_download_info: list of lists
-        Information from "ad_knowledge_portal_downloads_june_december_2020" CSV file,
-        pulled into program by read_download_info_csv_with_pandas function above.
+    download_count_series: pandas Series
+        The object returned by the count_downloads_by_group function in Section 2 above.
 
     Returns
     ----------
-    sorted_study_download_info: dict
-        Descending-order dictionary of download counts organized by 
+    sorted_study_download_info: pandas Series
+        Descending-order Series of download counts organized by 
         study.
 
     """
     
-    study_dict = {}
-
-    for download_info_row_list in list_of_row_lists_download_info:
-        if download_info_row_list[2] not in study_dict:
-            study_dict[download_info_row_list[2]] = 1
-        elif download_info_row_list[2] in study_dict:
-            study_dict[download_info_row_list[2]] += 1
-
-    sorted_study_download_info = sorted(study_dict.items(), key=lambda x: x[1], reverse=True)
-
-    sorted_study_download_info = dict(sorted_study_download_info)
+    sorted_study_download_info = sum_download_counts_by(download_count_series, "study")
 
     return sorted_study_download_info
 
 
-def file_count_by_study(list_of_row_lists_file_info):
+def file_count_by_study(file_info_df):
     """
     Counts number of files in AD Knowledge Portal by study.
 
@@ -668,27 +1080,18 @@ def file_count_by_study(list_of_row_lists_file_info):
     
     Parameters
     ----------
-    list_of_row_lists_file_info: list of lists
+    file_info_df: pandas DataFrame
         Information from "ad_knowledge_portal_files_information" CSV file,
         pulled into program by read_file_info_csv_with_pandas function in Section 1 above.
 
     Returns
     ----------
-    sorted_file_count_info_by_study: dict
-        Descending-order dictionary of number of files by study.
+    sorted_file_count_info_by_study: pandas Series
+        Descending-order Series of number of files by study.
     """
 
-    file_count_dict_by_study = {}
-
-    for file_info_row_list in list_of_row_lists_file_info:
-        if file_info_row_list[3] not in file_count_dict_by_study:
-            file_count_dict_by_study[file_info_row_list[3]] = 1
-        elif file_info_row_list[3] in file_count_dict_by_study:
-            file_count_dict_by_study[file_info_row_list[3]] += 1
-
-    sorted_file_count_info_by_study = sorted(file_count_dict_by_study.items(), key=lambda x: x[1], reverse=True)
-
-    sorted_file_count_info_by_study = dict(sorted_file_count_info_by_study)
+    # Stable sort: tied counts keep the order in which each study first appears.
+    sorted_file_count_info_by_study = file_info_df["study"].value_counts(sort=False).sort_values(ascending=False, kind="stable")
 
     return sorted_file_count_info_by_study
 
@@ -705,12 +1108,12 @@ def write_study_info_to_csv_file(output_filename, sorted_study_download_info, so
 
     Parameters
     ----------
-    sorted_study_download_info: dict
-        Descending-order dictonary of download counts organized by 
+    sorted_study_download_info: pandas Series
+        Descending-order Series of download counts organized by 
         study.
 
-    sorted_file_count_info_by_study: dict
-        Descending-order dictionary of number of files by study.
+    sorted_file_count_info_by_study: pandas Series
+        Descending-order Series of number of files by study.
 
     output_filename: string
         The name of the desired CSV file to which
@@ -721,23 +1124,13 @@ def write_study_info_to_csv_file(output_filename, sorted_study_download_info, so
     output_csv_3: CSV
         A spreadsheet file with the parameter lists described above.
     """
-    with open(output_filename, 'w', encoding='utf-8') as output_csv_3:
+    with open(output_filename, 'w', encoding='utf-8', newline='', buffering=1 << 20) as output_csv_3:
 
         fieldnames = ["study", "number of file downloads", "", "", "study", "number of files in AD Knowledge Portal"]
 
-        writer = csv.DictWriter(output_csv_3, fieldnames = fieldnames)
-
-        writer.writeheader()
+        value_count_table = build_value_count_table(fieldnames, sorted_study_download_info, sorted_file_count_info_by_study)
 
-        for key, value in sorted_study_download_info.items():
-            writer.writerow({"study": key, "number of file downloads": value})
-            
-        for key, value in sorted_file_count_info_by_study.items():
-            if len(key) == 0:
-                key = "[NULL]"
-                writer.writerow({"study": key, "number of files in AD Knowledge Portal": value})
-            else:
-                writer.writerow({"study": key, "number of files in AD Knowledge Portal": value})
+        value_count_table.to_csv(output_csv_3, index=False, lineterminator="\n")
         
     return output_csv_3
 
@@ -748,123 +1141,140 @@ def write_study_info_to_csv_file(output_filename, sorted_study_download_info, so
 #########################################################################################################################################################
 #########################################################################################################################################################
 
-# EXECUTION OF CODE BELOW
+# PROGRAM OUTPUT BANNERS
+# Each banner is written to the terminal with a single sys.stdout.write call.
+
+RULE = "----------------------------------------------------------------------------------------------------------"
+
+PROGRAM_BANNER = (
+    "\n"
+    "PRELIMINARY METADATA PROCESSING FOR SAGE BIONETWORKS AD KNOWLEDGE PORTAL PRESERVATION ASSESSMENT PROJECT.\n"
+    "\n"
+)
+
+SECTION1_BANNER = (
+    RULE + "\n"
+    "SECTION 1: FUNCTIONS TO MANAGE FILE INFORMATION METADATA\n"
+    "\n"
+    "NOTE: All Section 1 values printed below should be 99764, the number of rows in the file metadata input spreadsheet excluding the header row.\n"
+    "A consistent return of 99764 indicates that no records are getting lost as the data moves through the various functions of this script.\n"
+    "\n"
+)
+
+SECTION1_COMPLETE = (
+    "PRELIMINARY DATA PROCESSING FOR SECTION 1 COMPLETE.\n"
+    "Please view output_file_info_values_and_counts.csv, generated in the same folder as this script,\n"
+    "for lists of file formats and file name extensions with associated counts.\n"
+    "\n"
+)
+
+SECTION2_BANNER = (
+    RULE + "\n"
+    "\n"
+    "SECTION 2: FUNCTIONS TO MANAGE DOWNLOAD INFORMATION (JUNE-DECEMBER 2020)\n"
+    "\n"
+    "NOTE: All Section 2 values printed below should be 205133, the number of rows in the downloads input spreadsheet excluding the header row.\n"
+    "A consistent return of 205133 indicates that no records are getting lost as the data moves through the various functions of this script.\n"
+    "THERE IS ONE EXCEPTION TO THIS RULE. The NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT should be 204507.\n"
+    "The difference between 205133 and 204507 is 626,\n"
+    "exactly the number of file identifiers in the \"ad_knowledge_portal_downloads_june_december_2020.csv\" file\n"
+    "that are not in the \"ad_knowledge_portal_files_information.csv\" file. Downloads of these files have no file format to count,\n"
+    "and are reported below as DOWNLOADS WITH NO MATCHING FILE METADATA RECORD.\n"
+    "\n"
+)
+
+SECTION2_COMPLETE = (
+    "PRELIMINARY DATA PROCESSING FOR SECTION 2 COMPLETE.\n"
+    "Please view output_download_info_values_and_counts.csv, generated in the same folder as this script,\n"
+    "for lists of download information by file format and filename format extension value.\n"
+    "\n"
+)
+
+SECTION3_BANNER = (
+    RULE + "\n"
+    "\n"
+    "SECTION 3: ORGANIZING FILE AND DOWNLOAD INFORMATION BY STUDY\n"
+    "\n"
+)
+
+SECTION3_COMPLETE = (
+    "PRELIMINARY DATA PROCESSING FOR SECTION 3 COMPLETE.\n"
+    "Please view output_study_info_file_and_download_values_and_counts.csv, generated in the same folder as this script,\n"
+    "for lists of file and download information organized by study.\n"
+    "\n"
+)
+
+END_BANNER = (
+    RULE + "\n"
+    "END OF PROGRAM. Please view associated GitHub repository for program documentation.\n"
+    + RULE + "\n"
+)
+
+
+#########################################################################################################################################################
+#########################################################################################################################################################
+#########################################################################################################################################################
 
+# EXECUTION OF CODE BELOW
 
 if __name__ == "__main__":
     
     output_message()
 
-    print('\n')
-    print('PRELIMINARY METADATA PROCESSING FOR SAGE BIONETWORKS AD KNOWLEDGE PORTAL PRESERVATION ASSESSMENT PROJECT.')
-    print('\n')
-    print('----------------------------------------------------------------------------------------------------------')
-    print('SECTION 1: FUNCTIONS TO MANAGE FILE INFORMATION METADATA')
-    print('\n')
-
-    print('NOTE: All Section 1 values printed below should be 99764, the number of rows in the file metadata input spreadsheet excluding the header row.')
-    print('A consistent return of 99764 indicates that no records are getting lost as the data moves through the various functions of this script.')
-    print('\n')
-
-    list_of_row_lists_file_info = read_file_info_csv_with_pandas("ad_knowledge_portal_files_information.csv")
-    print("NUMBER OF ROWS FROM INPUT SPREADSHEET: ", len(list_of_row_lists_file_info))
-    print('\n')
-
-    fileFormat_list = create_fileFormat_list(list_of_row_lists_file_info)
-    print("NUMBER OF FILE FORMAT VALUES: ", len(fileFormat_list))
-    print('\n')
-
-    fileName_list = create_fileName_list(list_of_row_lists_file_info)
-    print("NUMBER OF FILE NAME VALUES: ", len(fileName_list))
-    print('\n')
-
-    sorted_fileFormat_info = count_fileFormats(fileFormat_list)
-
-    sum_format_val = 0
-    for format_val in sorted_fileFormat_info:
-        sum_format_val = sum_format_val + int(format_val[1])
-    print("TOTAL NUMBER OF FILE FORMAT VALUES IN LIST ORDERED BY FREQUENCY: ", sum_format_val)
-    print('\n')
-
-
-    sorted_fileNameExtensions_info = count_fileNameExtensions(fileName_list)
-
-    sum_name_extension_val = 0
-    for name_extension_val in sorted_fileNameExtensions_info:
-        sum_name_extension_val = sum_name_extension_val + int(name_extension_val[1])
-    print("TOTAL NUMBER OF FILE NAME EXTENSION VALUES IN LIST ORDERED BY FREQUENCY: ", sum_name_extension_val)
-    print('\n')
-
-    output_csv = write_preliminary_data_processing_results('output_file_info_values_and_counts.csv', sorted_fileFormat_info, sorted_fileNameExtensions_info)
-    print("""PRELIMINARY DATA PROCESSING FOR SECTION 1 COMPLETE. 
-    Please view output_file_info_values_and_counts.csv, generated in the same folder as this script, 
-    for lists of file formats and file name extensions with associated counts.""")
-    print('\n')
-    print('----------------------------------------------------------------------------------------------------------')
-    print('\n')
-    print('\n')
-    print('SECTION 2: FUNCTIONS TO MANAGE DOWNLOAD INFORMATION (JUNE-DECEMBER 2020)')
-    print('\n')
-
-    print('NOTE: All Section 2 values printed below should be 205133, the number of rows in the downloads input spreadsheet excluding the header row.')
-    print('A consistent return of 2015133 indicates that no records are getting lost as the data moves through the various functions of this script.')
-    print('THERE IS ONE EXCEPTION TO THIS RULE. The NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT should be 204507.')
-    print('''The difference between 205133 and 204507 is 626, 
-    exactly the number of file identifiers in the "ad_knowledge_portal_downloads_june_december_2020.csv" file
-    that are not in the "ad_knowledge_portal_files_information.csv" file. These files were omitted by a function structure
-    that seeks to avoid the nested "for loops" with which Python is notoriously slow when large datasets are involved.''')
-    print('\n')
-
-    list_of_row_lists_file_info = read_file_info_csv_with_pandas("ad_knowledge_portal_files_information.csv")
-
-    list_of_row_lists_download_info = read_download_info_csv_with_pandas('ad_knowledge_portal_downloads_june_december_2020.csv')
-    print("NUMBER OF ROWS FROM INPUT SPREADSHEET: ", len(list_of_row_lists_download_info))
-    print('\n')
-
-    sorted_file_identifier_download_info = download_frequency_by_identifier(list_of_row_lists_download_info)
-    print("NUMBER OF DOWNLOADS RECORDED BY FILE IDENTIFIER: ", sum(sorted_file_identifier_download_info.values()))
-    print('\n')
-
-    intersection_list_with_file_format_info = create_intersection_list(list_of_row_lists_file_info, list_of_row_lists_download_info)
-
-    sorted_file_format_info = download_frequency_by_file_format(intersection_list_with_file_format_info, sorted_file_identifier_download_info) 
-    print("NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT: ", sum(sorted_file_format_info.values()), " (should be 204507 due to function structure)")
-    print('\n')
-
-    sorted_filename_format_extensions_info = download_frequency_by_filename_format_extension(list_of_row_lists_download_info)
-    print("NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT EXTENSION: ", sum(sorted_filename_format_extensions_info.values()))
-    print('\n')
-
-    output_csv_2 = write_download_info_to_csv_file('output_download_info_values_and_counts.csv', sorted_file_format_info, sorted_filename_format_extensions_info)
-
-
-    print('\n')
-    print("""PRELIMINARY DATA PROCESSING FOR SECTION 2 COMPLETE. 
-    Please view output_download_info_values_and_counts.csv, generated in the same folder as this script, 
-    for lists of download information by file format and filename format extension value.""")
-    print('\n')
-    print('----------------------------------------------------------------------------------------------------------')
-    print('\n')
-    print('\n')
-    print('SECTION 3: ORGANIZING FILE AND DOWNLOAD INFORMATION BY STUDY')
-    print('\n')
-
-    sorted_study_download_info = download_count_by_study(list_of_row_lists_download_info)
-    print("NUMBER OF DOWNLOADS ORGANIZED BY STUDY: ", sum(sorted_study_download_info.values()), " (should be 205133, but might be lower if minor data loss has occurred).")
-    print('\n')
-
-    sorted_file_count_info_by_study = file_count_by_study(list_of_row_lists_file_info)
-    print("NUMBER OF AD KNOWLEDGE PORTAL FILES ORGANIZED BY STUDY: ", sum(sorted_file_count_info_by_study.values()), " (should be 99764, but might be lower if minor data loss has occurred).")
-    print('\n')
+    sys.stdout.write(PROGRAM_BANNER)
+    sys.stdout.write(SECTION1_BANNER)
 
-    output_csv_3 = write_study_info_to_csv_file('output_study_info_file_and_download_values_and_counts.csv', sorted_study_download_info, sorted_file_count_info_by_study)
+    file_info_df = read_file_info_csv_with_pandas("ad_knowledge_portal_files_information.csv")
+
+    # The study counts in file_info_summary are used in Section 3 below.
+    file_info_summary = run_section1(file_info_df)
+
+    print("NUMBER OF ROWS FROM INPUT SPREADSHEET: ", len(file_info_df), end="\n\n")
+
+    fileFormat_series = file_info_df["fileFormat"]
+    print("NUMBER OF FILE FORMAT VALUES: ", len(fileFormat_series), end="\n\n")
+
+    fileName_series = file_info_df["name"]
+    print("NUMBER OF FILE NAME VALUES: ", len(fileName_series), end="\n\n")
+
+    sorted_fileFormat_info = file_info_summary["fileFormat"]
+    check_total(sorted_fileFormat_info.sum(), 99764, "TOTAL NUMBER OF FILE FORMAT VALUES IN LIST ORDERED BY FREQUENCY")
+
+    sorted_fileNameExtensions_info = file_info_summary["fileNameExtension"]
+    check_total(sorted_fileNameExtensions_info.sum(), 99764, "TOTAL NUMBER OF FILE NAME EXTENSION VALUES IN LIST ORDERED BY FREQUENCY")
+
+    sys.stdout.write(SECTION1_COMPLETE)
+
+    sys.stdout.write(SECTION2_BANNER)
 
-    print("""PRELIMINARY DATA PROCESSING FOR SECTION 3 COMPLETE. 
-    Please view output_study_info_file_and_download_values_and_counts.csv, generated in the same folder as this script, 
-    for lists of file and download information organized by study.""")
+    # file_info_df from Section 1 is reused here rather than reading the file metadata CSV again.
+    # The study counts in download_info_summary are used in Section 3 below.
+    download_info_summary = run_section2(file_info_df, 'ad_knowledge_portal_downloads_june_december_2020.csv')
+
+    print("NUMBER OF ROWS FROM INPUT SPREADSHEET: ", download_info_summary["rows"], end="\n\n")
+
+    sorted_file_identifier_download_info = download_info_summary["id"]
+    check_total(sorted_file_identifier_download_info.sum(), 205133, "NUMBER OF DOWNLOADS RECORDED BY FILE IDENTIFIER")
+
+    sorted_file_format_info = download_info_summary["fileFormat"]
+    check_total(sorted_file_format_info.sum(), 204507, "NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT")
+
+    check_total(download_info_summary["unmatched"], 626, "NUMBER OF DOWNLOADS WITH NO MATCHING FILE METADATA RECORD")
+
+    sorted_filename_format_extensions_info = download_info_summary["fileNameExtension"]
+    check_total(sorted_filename_format_extensions_info.sum(), 205133, "NUMBER OF DOWNLOADS RECORDED BY FILE FORMAT EXTENSION")
+
+    sys.stdout.write(SECTION2_COMPLETE)
+
+    sys.stdout.write(SECTION3_BANNER)
+
+    sorted_study_download_info = download_info_summary["study"]
+    check_total(sorted_study_download_info.sum(), 205133, "NUMBER OF DOWNLOADS ORGANIZED BY STUDY")
+
+    sorted_file_count_info_by_study = file_info_summary["study"]
+    check_total(sorted_file_count_info_by_study.sum(), 99764, "NUMBER OF AD KNOWLEDGE PORTAL FILES ORGANIZED BY STUDY")
+
+    output_csv_3 = write_study_info_to_csv_file('output_study_info_file_and_download_values_and_counts.csv', sorted_study_download_info, sorted_file_count_info_by_study)
+    sys.stdout.write(SECTION3_COMPLETE)
 
-    print('\n')
-    print('----------------------------------------------------------------------------------------------------------')
-    print('END OF PROGRAM. Please view associated GitHub repository for program documentation.')
-    print('----------------------------------------------------------------------------------------------------------')
-    print('\n')
+    sys.stdout.write(END_BANNER)